@@ -0,0 +1,35 @@
+"""
+Point d'entrée pour l'exécution directe: `python -m app` (depuis backend/).
+
+Le lancement se fait depuis ce module plutôt que depuis app.main: un
+processus démarré en "spawn" (workers uvicorn, pool de pdf_loader) ne
+réimporte pas un module `__main__` de package, alors qu'il réexécuterait
+app.main et initialiserait toute l'application (clients Azure OpenAI,
+Pinecone, executor d'ingestion) dans chaque worker du pool PDF.
+
+En production, les workers peuvent aussi être gérés par gunicorn:
+  API_WORKERS=4 gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000 app.main:app
+(API_WORKERS sert aussi à répartir les CPU entre les pools PDF des workers).
+Les statuts d'ingestion sont partagés via INGEST_STATUS_DIR: /upload-status
+répond quel que soit le worker qui a reçu l'upload.
+"""
+import os
+
+import uvicorn
+
+from .config import API_WORKERS
+
+if __name__ == "__main__":
+    # UVICORN_RELOAD=true pour le développement (un seul worker)
+    reload = os.getenv("UVICORN_RELOAD", "false").lower() == "true"
+    
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload,
+        workers=None if reload else API_WORKERS,
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )
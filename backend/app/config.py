@@ -9,6 +9,8 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 AZURE_OPENAI_VERSION = os.getenv("AZURE_OPENAI_VERSION", "2024-02-01")
 AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+# Timeout (secondes) de chaque requête Azure OpenAI
+AZURE_OPENAI_TIMEOUT = float(os.getenv("AZURE_OPENAI_TIMEOUT", "30"))
 
 # Configuration Pinecone
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
@@ -16,6 +18,36 @@ PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "azure-openai-rag-index")
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE")
 PINECONE_DIMENSION = int(os.getenv("PINECONE_DIMENSION", "1536"))
 
+# Paramètres d'ingestion
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+# Processus API (uvicorn via `python -m app`; à aligner sur -w avec gunicorn)
+API_WORKERS = int(os.getenv("API_WORKERS", "0")) or max(2, (os.cpu_count() or 2) // 2)
+# Processus du pool PDF de chaque worker API: par défaut les CPU - 1 sont
+# répartis entre les API_WORKERS (pools indépendants, un par worker)
+LOAD_PDF_WORKERS = int(os.getenv("LOAD_PDF_WORKERS", "0")) or max(
+    1, ((os.cpu_count() or 2) - 1) // API_WORKERS
+)
+# En dessous de ce nombre de pages, le PDF est traité sans le pool de processus
+LOAD_PDF_POOL_MIN_PAGES = int(os.getenv("LOAD_PDF_POOL_MIN_PAGES", "20"))
+# Cache disque des embeddings des chunks ("" = désactivé)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "cache")
+
+# Ingestions en arrière-plan (par processus API)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", "3600"))
+INGEST_STATUS_DIR = os.getenv("INGEST_STATUS_DIR", os.path.join("tmp_uploads", "status"))
+
+# Cache des résultats de recherche
+RETRIEVER_CACHE_PATH = os.getenv("RETRIEVER_CACHE_PATH", "retriever.cache.dbm")
+RETRIEVER_CACHE_TTL = int(os.getenv("RETRIEVER_CACHE_TTL", "3600"))
+
+# Caches des questions (embeddings et réponses sémantiquement proches)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+# Nombre total de réponses en cache, tous documents confondus (0 = désactivé)
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+
 # Paramètres de modèle
 OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
 
@@ -1,17 +1,29 @@
+import asyncio
 import os
-import shutil
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Optional
+
+import aiofiles
+import orjson
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from .rag_pipeline import ingest_pdf, build_qa_chain
+from .config import INGEST_JOB_TTL, INGEST_STATUS_DIR, INGEST_WORKERS
+from .rag_pipeline import (
+    astream_qa,
+    build_qa_chain,
+    ingest_pdf,
+    semantic_cache,
+)
 
 app = FastAPI(
     title="RAG Chatbot avec Azure OpenAI",
     description="API pour chatbot RAG utilisant Azure OpenAI et Pinecone",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # ⚠️ CONFIGURATION CORS ESSENTIELLE ⚠️
@@ -23,6 +35,60 @@ app.add_middleware(
     allow_headers=["*"],  # Tous les headers
 )
 
+# Ingestions des PDF exécutées en arrière-plan. Des threads suffisent: une
+# ingestion attend surtout Azure OpenAI et Pinecone, et le découpage des PDF
+# utilise déjà le pool de processus de pdf_loader.
+ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS)
+
+# Statut des ingestions: un fichier JSON par doc_id dans INGEST_STATUS_DIR,
+# partagé par tous les workers de l'API (qui tournent sur la même machine),
+# quel que soit le worker qui a reçu l'upload.
+def _job_status_path(doc_id: str) -> str:
+    return os.path.join(INGEST_STATUS_DIR, f"{doc_id}.json")
+
+def _write_job_status(doc_id: str, status: str, detail: Optional[str] = None) -> None:
+    os.makedirs(INGEST_STATUS_DIR, exist_ok=True)
+    path = _job_status_path(doc_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps({"status": status, "detail": detail}))
+    os.replace(tmp_path, path)
+
+def _read_job_status(doc_id: str) -> Optional[dict]:
+    """
+    Lit le statut d'une ingestion. Une ingestion encore "processing" après
+    INGEST_JOB_TTL secondes a perdu son worker (arrêt, redémarrage, OOM):
+    elle est signalée en échec.
+    """
+    try:
+        with open(_job_status_path(doc_id), "rb") as f:
+            job_status = orjson.loads(f.read())
+            updated_at = os.fstat(f.fileno()).st_mtime
+    except FileNotFoundError:
+        return None
+    
+    if job_status["status"] == "processing" and time.time() - updated_at > INGEST_JOB_TTL:
+        return {
+            "status": "failed",
+            "detail": "Ingestion interrompue (worker de l'API arrêté), veuillez réessayer",
+        }
+    return job_status
+
+def _prune_job_statuses() -> None:
+    """
+    Supprime les statuts de plus de INGEST_JOB_TTL secondes, y compris les
+    ingestions restées "processing" dont le worker a été arrêté.
+    """
+    if not os.path.isdir(INGEST_STATUS_DIR):
+        return
+    now = time.time()
+    for entry in os.scandir(INGEST_STATUS_DIR):
+        try:
+            if now - entry.stat().st_mtime > INGEST_JOB_TTL:
+                os.remove(entry.path)
+        except OSError:
+            continue
+
 # --- Modèles de données (Schemas) ---
 class ChatMessage(BaseModel):
     role: str
@@ -39,9 +105,15 @@ class ChatResponse(BaseModel):
 
 class UploadResponse(BaseModel):
     doc_id: str
+    status: str
     message: str
     filename: str
 
+class UploadStatusResponse(BaseModel):
+    doc_id: str
+    status: str
+    detail: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     message: str
@@ -57,7 +129,9 @@ async def root():
             "docs": "/docs",
             "health": "/health",
             "upload": "/upload-pdf",
-            "chat": "/chat"
+            "upload_status": "/upload-status/{doc_id}",
+            "chat": "/chat",
+            "chat_stream": "/chat/stream"
         }
     }
 
@@ -69,9 +143,19 @@ async def health_check():
         message="API RAG Chatbot est opérationnelle avec Azure OpenAI"
     )
 
+def _remove_temp_file(file_path: str) -> None:
+    """Nettoyage du fichier temporaire."""
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def _ingest_error_message(error: BaseException) -> str:
+    if "PDF" in str(error) and "corrupt" in str(error).lower():
+        return "Le fichier PDF semble corrompu ou invalide"
+    return f"Erreur lors du traitement du PDF: {str(error)}"
+
 @app.post("/upload-pdf", response_model=UploadResponse)
 async def upload_pdf(file: UploadFile = File(...)):
-    """Endpoint pour uploader et ingérer un PDF."""
+    """Endpoint pour uploader un PDF; l'ingestion se poursuit en arrière-plan."""
     
     # Validation du type de fichier
     if file.content_type != "application/pdf":
@@ -88,84 +172,194 @@ async def upload_pdf(file: UploadFile = File(...)):
     file_extension = os.path.splitext(file.filename)[1]
     unique_filename = f"{uuid.uuid4()}{file_extension}"
     file_path = os.path.join(temp_dir, unique_filename)
+    doc_id = str(uuid.uuid4())
     
     try:
-        # Sauvegarde temporaire du fichier
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Sauvegarde temporaire du fichier, par blocs de 1 Mo sans bloquer la boucle
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 20):
+                await buffer.write(chunk)
         
         # Validation que le fichier n'est pas vide
         if os.path.getsize(file_path) == 0:
             raise HTTPException(status_code=400, detail="Le fichier PDF est vide")
         
-        # Appel à notre pipeline d'ingestion
-        doc_id = ingest_pdf(file_path)
+        # Soumission à notre pipeline d'ingestion
+        future = ingest_executor.submit(ingest_pdf, file_path, doc_id)
         
-        return UploadResponse(
-            doc_id=doc_id,
-            message="PDF traité et ingéré avec succès dans Azure OpenAI + Pinecone",
-            filename=file.filename
-        )
+    except HTTPException:
+        _remove_temp_file(file_path)
+        raise
         
     except Exception as e:
-        error_message = f"Erreur lors du traitement du PDF: {str(e)}"
-        if "PDF" in str(e) and "corrupt" in str(e).lower():
-            error_message = "Le fichier PDF semble corrompu ou invalide"
-        
-        raise HTTPException(status_code=500, detail=error_message)
-        
-    finally:
-        # Nettoyage du fichier temporaire
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        _remove_temp_file(file_path)
+        raise HTTPException(status_code=500, detail=_ingest_error_message(e))
+    
+    _prune_job_statuses()
+    _write_job_status(doc_id, "processing")
+    future.add_done_callback(lambda f: _on_ingest_done(f, doc_id, file_path))
+    
+    return UploadResponse(
+        doc_id=doc_id,
+        status="processing",
+        message="PDF reçu, ingestion en cours dans Azure OpenAI + Pinecone",
+        filename=file.filename
+    )
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_with_doc(request: ChatRequest):
-    """Endpoint pour poser une question sur un document."""
+def _on_ingest_done(future: Future, doc_id: str, file_path: str) -> None:
+    """Enregistre le statut final de l'ingestion et nettoie le fichier temporaire."""
+    _remove_temp_file(file_path)
+    
+    if future.cancelled():
+        _write_job_status(doc_id, "failed", "Ingestion annulée (arrêt de l'API)")
+    elif future.exception() is not None:
+        _write_job_status(doc_id, "failed", _ingest_error_message(future.exception()))
+    else:
+        _write_job_status(
+            doc_id, "completed", "PDF traité et ingéré avec succès dans Azure OpenAI + Pinecone"
+        )
+
+@app.get("/upload-status/{doc_id}", response_model=UploadStatusResponse)
+async def upload_status(doc_id: str):
+    """Endpoint pour suivre l'ingestion d'un PDF."""
+    try:
+        uuid.UUID(doc_id)
+        job_status = _read_job_status(doc_id)
+    except ValueError:
+        job_status = None
     
-    # Validation des paramètres
+    if job_status is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Aucune ingestion trouvée pour le doc_id '{doc_id}'"
+        )
+    
+    return UploadStatusResponse(
+        doc_id=doc_id,
+        status=job_status["status"],
+        detail=job_status["detail"]
+    )
+
+def _validate_chat_request(request: ChatRequest) -> None:
+    """Validation des paramètres."""
     if not request.doc_id or not request.doc_id.strip():
         raise HTTPException(status_code=400, detail="doc_id est requis")
     
     if not request.question or not request.question.strip():
         raise HTTPException(status_code=400, detail="question est requise")
+
+def _format_sources(docs) -> List[dict]:
+    """Extraction et formatage des sources pour citation."""
+    sources = []
+    for doc in docs:
+        source_info = {
+            "page_number": doc.metadata.get("page_number", "N/A"),
+            "snippet": doc.page_content[:250] + ("..." if len(doc.page_content) > 250 else ""),
+            "doc_id": doc.metadata.get("doc_id", "N/A")
+        }
+        sources.append(source_info)
+    return sources
+
+def _chat_error_message(error: Exception, doc_id: str) -> str:
+    error_detail = f"Erreur lors de la génération de la réponse: {str(error)}"
+    
+    # Gestion d'erreurs spécifiques
+    if "index" in str(error).lower() or "not found" in str(error).lower():
+        error_detail = f"Document avec doc_id '{doc_id}' non trouvé. Assurez-vous que le document a été correctement uploadé."
+    elif "timeout" in str(error).lower():
+        error_detail = "Délai d'attente dépassé lors de la communication avec Azure OpenAI. Veuillez réessayer."
+    
+    return error_detail
+
+def _sse_event(payload: dict) -> bytes:
+    """Encode un événement Server-Sent Events."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_with_doc(request: ChatRequest):
+    """Endpoint pour poser une question sur un document."""
+    _validate_chat_request(request)
     
     try:
+        # Réponse déjà produite pour une question similaire sur ce document
+        cached_response = await asyncio.to_thread(
+            semantic_cache.lookup, request.doc_id, request.question
+        )
+        if cached_response is not None:
+            return ORJSONResponse(content=cached_response)
+        
         # Construction de la chaîne QA
         qa_chain = build_qa_chain(request.doc_id)
         
         # Exécution de la chaîne RAG
-        result = qa_chain.invoke(request.question)
+        result = await qa_chain.ainvoke(request.question)
         answer = result["answer"]
+        sources = _format_sources(result.get("source_documents", []))
         
-        # Extraction et formatage des sources pour citation
-        sources = []
-        for doc in result.get("source_documents", []):
-            source_info = {
-                "page_number": doc.metadata.get("page_number", "N/A"),
-                "snippet": doc.page_content[:250] + ("..." if len(doc.page_content) > 250 else ""),
-                "doc_id": doc.metadata.get("doc_id", "N/A")
-            }
-            sources.append(source_info)
-        
-        return ChatResponse(answer=answer, sources=sources)
+        # Sérialisation unique du modèle, puis encodage direct par orjson
+        response = ChatResponse(answer=answer, sources=sources).model_dump()
+        # Une réponse produite sans contexte n'est pas réutilisable
+        if sources:
+            await asyncio.to_thread(
+                semantic_cache.store, request.doc_id, request.question, response
+            )
+        return ORJSONResponse(content=response)
         
     except Exception as e:
-        error_detail = f"Erreur lors de la génération de la réponse: {str(e)}"
-        
-        # Gestion d'erreurs spécifiques
-        if "index" in str(e).lower() or "not found" in str(e).lower():
-            error_detail = f"Document avec doc_id '{request.doc_id}' non trouvé. Assurez-vous que le document a été correctement uploadé."
-        elif "timeout" in str(e).lower():
-            error_detail = "Délai d'attente dépassé lors de la communication avec Azure OpenAI. Veuillez réessayer."
-        
-        raise HTTPException(status_code=500, detail=error_detail)
+        raise HTTPException(status_code=500, detail=_chat_error_message(e, request.doc_id))
+
+@app.post("/chat/stream")
+async def chat_with_doc_stream(request: ChatRequest):
+    """
+    Endpoint pour poser une question sur un document, avec la réponse
+    envoyée token par token (Server-Sent Events): {"token": ...} pendant la
+    génération, puis {"sources": [...]} en dernier événement.
+    """
+    _validate_chat_request(request)
+    
+    async def event_stream():
+        try:
+            # Réponse déjà produite pour une question similaire sur ce document
+            cached_response = await asyncio.to_thread(
+                semantic_cache.lookup, request.doc_id, request.question
+            )
+            if cached_response is not None:
+                yield _sse_event({"token": cached_response["answer"]})
+                yield _sse_event({"sources": cached_response["sources"]})
+                return
+            
+            answer_parts = []
+            async for event in astream_qa(request.doc_id, request.question):
+                if "token" in event:
+                    answer_parts.append(event["token"])
+                    yield _sse_event(event)
+                else:
+                    sources = _format_sources(event["source_documents"])
+                    yield _sse_event({"sources": sources})
+            
+            # Une réponse produite sans contexte n'est pas réutilisable
+            if sources:
+                response = ChatResponse(answer="".join(answer_parts), sources=sources).model_dump()
+                await asyncio.to_thread(
+                    semantic_cache.store, request.doc_id, request.question, response
+                )
+            
+        except Exception as e:
+            # Les en-têtes sont déjà envoyés: l'erreur est transmise comme événement
+            yield _sse_event({"error": _chat_error_message(e, request.doc_id)})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.on_event("shutdown")
+def shutdown_ingest_executor():
+    """Arrêt des workers d'ingestion à l'arrêt de l'API."""
+    ingest_executor.shutdown(wait=False, cancel_futures=True)
 
 # Gestionnaire d'erreurs global
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Gestionnaire d'erreurs global pour toutes les exceptions non gérées."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": f"Une erreur interne est survenue: {str(exc)}",
@@ -173,13 +367,10 @@ async def global_exception_handler(request, exc):
         }
     )
 
-# Point d'entrée pour l'exécution directe
+# Point d'entrée pour l'exécution directe: voir app/__main__.py. Lancé en
+# `python -m app.main`, ce module serait réimporté par chaque processus
+# "spawn"; on relance donc l'API via `python -m app`.
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    import sys
+    
+    os.execv(sys.executable, [sys.executable, "-m", "app", *sys.argv[1:]])
@@ -0,0 +1,104 @@
+"""Chargement et découpage des PDF, parallélisés sur un pool de processus.
+
+Ce module n'importe que pypdf et le splitter. Les workers du pool (contexte
+"spawn") réimportent aussi le module `__main__` du parent: l'API doit donc
+être lancée par `python -m app`, gunicorn ou la CLI uvicorn, et non par
+`python -m app.main` (qui initialiserait toute l'application dans chaque
+worker). app.main relance d'ailleurs `python -m app` dans ce cas.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Découpage mesuré en tokens (encodage des modèles d'embedding OpenAI)
+text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    encoding_name="cl100k_base",
+    chunk_size=512,
+    chunk_overlap=64,
+    add_start_index=True,
+)
+
+# Pool unique, créé au premier PDF assez long et partagé par les ingestions
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _split_pages(
+    reader: PdfReader, file_path: str, document_id: str, page_indices: Sequence[int]
+) -> List[Document]:
+    # Métadonnées de filtrage posées sur les pages: le splitter les
+    # recopie dans chacun de leurs chunks
+    pages = [
+        Document(
+            page_content=reader.pages[i].extract_text(),
+            metadata={"source": file_path, "page": i, "doc_id": document_id, "page_number": i},
+        )
+        for i in page_indices
+    ]
+    return text_splitter.split_documents(pages)
+
+def _load_and_split_pages(
+    file_path: str, document_id: str, page_indices: Sequence[int]
+) -> List[Document]:
+    """Extrait et découpe une plage de pages (exécuté dans un worker du pool)."""
+    return _split_pages(PdfReader(file_path), file_path, document_id, page_indices)
+
+def load_and_split_pdf(
+    file_path: str, document_id: str, workers: int, min_pages_for_pool: int
+) -> List[Document]:
+    """
+    Extrait le texte des pages puis les découpe en chunks. Les PDF d'au moins
+    `min_pages_for_pool` pages sont répartis en plages contiguës sur `workers`
+    processus (un seul aller-retour par plage); les autres sont traités ici.
+    """
+    reader = PdfReader(file_path)
+    n_pages = len(reader.pages)
+    
+    chunks = None
+    if workers > 1 and n_pages >= min_pages_for_pool:
+        step = -(-n_pages // workers)
+        ranges = [range(start, min(start + step, n_pages)) for start in range(0, n_pages, step)]
+        try:
+            results = _get_pool(workers).map(
+                _load_and_split_pages,
+                [file_path] * len(ranges),
+                [document_id] * len(ranges),
+                ranges,
+            )
+            chunks = [chunk for range_chunks in results for chunk in range_chunks]
+        except BrokenProcessPool as e:
+            logger.warning(f"⚠️ PDF worker pool broken, processing inline: {e}")
+            _reset_pool()
+    
+    if chunks is None:
+        chunks = _split_pages(reader, file_path, document_id, range(n_pages))
+    
+    logger.info(f"📖 Loaded {n_pages} pages, ✂️ split into {len(chunks)} chunks")
+    return chunks
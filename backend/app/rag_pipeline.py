@@ -1,23 +1,53 @@
 """RAG pipeline implemented with LangChain v1 (LCEL) components."""
 from __future__ import annotations
 
+import asyncio
+import errno
+import functools
+import hashlib
+import io
 import logging
+import os
+import pickle
+import struct
+import threading
 import time
 import uuid
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-from langchain_community.document_loaders import PyPDFLoader
+try:
+    import dbm.gnu as gdbm
+except ImportError:  # Python compilé sans gdbm: cache des recherches désactivé
+    gdbm = None
+
+import httpx
+import lz4.frame
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.runnables import (
+    Runnable,
     RunnableLambda,
     RunnableParallel,
     RunnablePassthrough,
 )
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pinecone import Pinecone
+try:
+    # Client gRPC (extra pinecone[grpc]): latence plus faible que REST
+    from pinecone.grpc import PineconeGRPC as Pinecone
+    PINECONE_TRANSPORT = "gRPC"
+except ImportError:
+    from pinecone import Pinecone
+    PINECONE_TRANSPORT = "REST"
+from pydantic import PrivateAttr
 
 from .config import (
     AZURE_OPENAI_KEY,
@@ -25,12 +55,24 @@ from .config import (
     AZURE_OPENAI_DEPLOYMENT,
     AZURE_OPENAI_VERSION,
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+    AZURE_OPENAI_TIMEOUT,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CONCURRENCY,
+    LOAD_PDF_POOL_MIN_PAGES,
+    LOAD_PDF_WORKERS,
     PINECONE_API_KEY,
     PINECONE_DIMENSION,
     PINECONE_INDEX_NAME,
     PINECONE_NAMESPACE,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    RETRIEVER_CACHE_PATH,
+    RETRIEVER_CACHE_TTL,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
     OPENAI_TEMPERATURE,
 )
+from .pdf_loader import load_and_split_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -38,51 +80,97 @@ logger = logging.getLogger(__name__)
 try:
     pc = Pinecone(api_key=PINECONE_API_KEY)
     PINE_CONE_AVAILABLE = True
-    logger.info("✅ Pinecone client initialized successfully")
+    logger.info(f"✅ Pinecone client initialized successfully ({PINECONE_TRANSPORT})")
 except Exception as e:
     logger.error(f"❌ Pinecone initialization failed: {e}")
     PINE_CONE_AVAILABLE = False
     raise
 
+@functools.lru_cache(maxsize=1)
+def _pinecone_index():
+    """Handle d'index Pinecone partagé entre les requêtes (connexions HTTP réutilisées)."""
+    return pc.Index(PINECONE_INDEX_NAME)
+
+# Positionné dès que l'index a été vérifié prêt: les ingestions suivantes
+# n'interrogent plus l'API de contrôle Pinecone.
+_index_ready = threading.Event()
+
 def _ensure_pinecone_index() -> None:
-    """Crée l'index Pinecone s'il n'existe pas déjà."""
+    """Crée l'index Pinecone s'il n'existe pas déjà et attend qu'il soit prêt."""
     if not PINE_CONE_AVAILABLE:
         raise RuntimeError("Pinecone is not available")
+    
+    if _index_ready.is_set():
+        return
         
     try:
         existing_indexes = [i.name for i in pc.list_indexes()]
         if PINECONE_INDEX_NAME in existing_indexes:
             logger.info(f"✅ Pinecone index '{PINECONE_INDEX_NAME}' already exists")
-            return
+        else:
+            logger.info(f"📦 Creating Pinecone index '{PINECONE_INDEX_NAME}'...")
+            pc.create_index(
+                name=PINECONE_INDEX_NAME,
+                dimension=PINECONE_DIMENSION,
+                metric="cosine",
+                spec={"serverless": {"cloud": "aws", "region": "us-east-1"}}
+            )
         
-        logger.info(f"📦 Creating Pinecone index '{PINECONE_INDEX_NAME}'...")
-        pc.create_index(
-            name=PINECONE_INDEX_NAME,
-            dimension=PINECONE_DIMENSION,
-            metric="cosine",
-            spec={"serverless": {"cloud": "aws", "region": "us-east-1"}}
-        )
+        # Attente que l'index soit prêt, avec backoff exponentiel
+        delay = 0.25
+        while not pc.describe_index(PINECONE_INDEX_NAME).status["ready"]:
+            logger.info(f"⏳ Waiting {delay:.2f}s for index to be ready...")
+            time.sleep(delay)
+            delay = min(delay * 1.5, 8.0)
         
-        # Attente que l'index soit prêt
-        logger.info("⏳ Waiting for index to be ready...")
-        while True:
-            idx = pc.describe_index(PINECONE_INDEX_NAME)
-            if idx.status["ready"]:
-                break
-            time.sleep(1)
+        _index_ready.set()
         logger.info(f"✅ Pinecone index '{PINECONE_INDEX_NAME}' is ready")
         
     except Exception as e:
         logger.error(f"❌ Failed to ensure Pinecone index: {e}")
         raise
 
+class CachedAzureOpenAIEmbeddings(AzureOpenAIEmbeddings):
+    """
+    AzureOpenAIEmbeddings avec mémoïsation LRU des embeddings de questions,
+    conservés en tableaux float32 en lecture seule (~6 Ko par entrée).
+    """
+    _cached_embed_query: Callable[[str], np.ndarray] = PrivateAttr()
+    
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        
+        @functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        def _cached_embed_query(text: str) -> np.ndarray:
+            vector = np.asarray(AzureOpenAIEmbeddings.embed_query(self, text), dtype=np.float32)
+            vector.setflags(write=False)
+            return vector
+        
+        self._cached_embed_query = _cached_embed_query
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._cached_embed_query(text).tolist()
+
+# Clients HTTP partagés par tous les appels Azure OpenAI du processus:
+# connexions HTTP/2 persistantes (pas de nouvelle négociation TLS par requête).
+# Le SDK OpenAI impose son propre timeout à chaque requête: il est donc
+# configuré sur les modèles (AZURE_OPENAI_TIMEOUT), pas sur ces clients.
+_http_limits = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+http_client = httpx.Client(http2=True, limits=_http_limits)
+http_async_client = httpx.AsyncClient(http2=True, limits=_http_limits)
+
 # Initialisation des modèles Azure OpenAI
 try:
-    embeddings = AzureOpenAIEmbeddings(
+    embeddings = CachedAzureOpenAIEmbeddings(
         azure_deployment=AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
         api_key=AZURE_OPENAI_KEY,
         api_version=AZURE_OPENAI_VERSION,
+        chunk_size=EMBEDDING_BATCH_SIZE,
+        max_retries=5,
+        timeout=AZURE_OPENAI_TIMEOUT,
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
     logger.info("✅ Azure OpenAI Embeddings initialized successfully")
     
@@ -92,6 +180,9 @@ try:
         api_key=AZURE_OPENAI_KEY,
         api_version=AZURE_OPENAI_VERSION,
         temperature=OPENAI_TEMPERATURE,
+        timeout=AZURE_OPENAI_TIMEOUT,
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
     logger.info("✅ Azure Chat OpenAI initialized successfully")
     
@@ -99,12 +190,181 @@ except Exception as e:
     logger.error(f"❌ Azure OpenAI initialization failed: {e}")
     raise
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=150,
-    add_start_index=True,
+def _quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantification scalaire int8 par ligne: matrix ≈ codes * scales[:, None].
+    """
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+class SemanticAnswerCache:
+    """
+    Cache sémantique des réponses, par document: une question dont
+    l'embedding a une similarité cosinus supérieure à `threshold` avec une
+    question déjà traitée reçoit la réponse mise en cache. Les embeddings
+    des questions sont conservés quantifiés en int8 (4x moins de mémoire).
+    
+    Le cache contient au plus `max_entries` réponses, tous documents
+    confondus (éviction LRU par document), valables `ttl` secondes.
+    """
+    
+    def __init__(self, threshold: float, max_entries: int, ttl: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # doc_id -> (codes int8 (N, dim), échelles (N,), horodatages (N,), réponses),
+        # du document le moins récemment utilisé au plus récent
+        self._entries: OrderedDict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]] = OrderedDict()
+        self._size = 0
+    
+    @staticmethod
+    def _embed(question: str) -> np.ndarray:
+        vector = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+    
+    def lookup(self, doc_id: str, question: str) -> Optional[Any]:
+        if self.max_entries <= 0:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(doc_id)
+        
+        codes, scales, stored_at, answers = entry
+        similarities = (codes.astype(np.float32) @ self._embed(question)) * scales
+        similarities[time.time() - stored_at > self.ttl] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        
+        logger.info(f"🎯 Semantic cache hit for doc_id {doc_id} (similarity={similarities[best]:.3f})")
+        return answers[best]
+    
+    def store(self, doc_id: str, question: str, answer: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        
+        code, scale = _quantize_int8(self._embed(question)[None, :])
+        now = time.time()
+        with self._lock:
+            codes, scales, stored_at, answers = self._entries.pop(
+                doc_id,
+                (
+                    np.empty((0, code.shape[1]), dtype=np.int8),
+                    np.empty(0, dtype=np.float32),
+                    np.empty(0),
+                    [],
+                ),
+            )
+            self._size -= len(answers)
+            
+            # Purge des entrées expirées du document, puis ajout de la nouvelle
+            fresh = now - stored_at <= self.ttl
+            answers = [a for a, keep in zip(answers, fresh) if keep] + [answer]
+            self._entries[doc_id] = (
+                np.vstack([codes[fresh], code])[-self.max_entries:],
+                np.concatenate([scales[fresh], scale])[-self.max_entries:],
+                np.append(stored_at[fresh], now)[-self.max_entries:],
+                answers[-self.max_entries:],
+            )
+            self._size += min(len(answers), self.max_entries)
+            
+            # Éviction des documents les moins récemment utilisés
+            while self._size > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[3])
+
+semantic_cache = SemanticAnswerCache(
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, ttl=RETRIEVER_CACHE_TTL
 )
 
+def _embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Calcule les embeddings par lots de EMBEDDING_BATCH_SIZE textes,
+    avec au plus EMBEDDING_CONCURRENCY requêtes Azure OpenAI en parallèle.
+    Renvoie une matrice float32 (N, dimension).
+    """
+    batches = [
+        texts[i:i + EMBEDDING_BATCH_SIZE]
+        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    ]
+    if len(batches) <= 1:
+        return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    
+    workers = min(EMBEDDING_CONCURRENCY, len(batches))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(embeddings.embed_documents, batches)
+        return np.asarray(
+            [vector for batch in results for vector in batch], dtype=np.float32
+        )
+
+def _embedding_cache_path(texts: List[str]) -> str:
+    """Fichier de cache identifié par le modèle d'embedding et le contenu des chunks."""
+    digest = hashlib.sha256(AZURE_OPENAI_EMBEDDING_DEPLOYMENT.encode())
+    for text in texts:
+        digest.update(b"\0")
+        digest.update(text.encode())
+    return os.path.join(EMBEDDING_CACHE_DIR, f"emb_{digest.hexdigest()}.npz.lz4")
+
+def _load_cached_embeddings(path: str, n_texts: int) -> Optional[np.ndarray]:
+    try:
+        with open(path, "rb") as f:
+            with np.load(io.BytesIO(lz4.frame.decompress(f.read()))) as data:
+                vectors = data["vectors"]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding cache read failed: {e}")
+        return None
+    return vectors if len(vectors) == n_texts else None
+
+def _save_cached_embeddings(path: str, vectors: np.ndarray) -> None:
+    try:
+        os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, vectors=vectors)
+        # Écriture atomique: plusieurs workers peuvent ingérer le même PDF
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(lz4.frame.compress(buffer.getvalue()))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding cache write failed: {e}")
+
+def _wait_until_queryable(
+    document_id: str, probe_vector: List[float], n_chunks: int, timeout: float = 60.0
+) -> None:
+    """
+    Attend que les chunks upsertés soient visibles dans les requêtes filtrées
+    (l'index serverless est cohérent à terme), avec backoff exponentiel.
+    Lève TimeoutError au-delà de `timeout`: l'ingestion est alors en échec.
+    """
+    expected = min(n_chunks, 1000)
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while True:
+        result = _pinecone_index().query(
+            vector=probe_vector,
+            top_k=expected,
+            filter={"doc_id": {"$eq": document_id}},
+            namespace=PINECONE_NAMESPACE,
+        )
+        if len(result.matches) >= expected:
+            return
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(
+                f"Only {len(result.matches)}/{expected} chunks of {document_id} "
+                f"are queryable in Pinecone after {timeout:.0f}s"
+            )
+        logger.info(f"⏳ Waiting {delay:.2f}s for {document_id} to be queryable...")
+        time.sleep(delay)
+        delay = min(delay * 1.5, 4.0)
+
 def ingest_pdf(file_path: str, doc_id: Optional[str] = None) -> str:
     """
     Charge un PDF, le découpe et stocke les vecteurs dans Pinecone.
@@ -118,34 +378,214 @@ def ingest_pdf(file_path: str, doc_id: Optional[str] = None) -> str:
     document_id = doc_id or str(uuid.uuid4())
     logger.info(f"📄 Processing PDF: {file_path} with doc_id: {document_id}")
     
-    loader = PyPDFLoader(file_path)
-    pages = loader.load()
-    logger.info(f"📖 Loaded {len(pages)} pages from PDF")
-    
-    # Ajout de métadonnées pour le filtrage
-    for i, page in enumerate(pages, start=1):
-        page.metadata["doc_id"] = document_id
-        page.metadata["page_number"] = page.metadata.get("page", i)
-    
-    chunks = text_splitter.split_documents(pages)
-    logger.info(f"✂️ Split into {len(chunks)} chunks")
+    chunks = load_and_split_pdf(
+        file_path,
+        document_id,
+        workers=LOAD_PDF_WORKERS,
+        min_pages_for_pool=LOAD_PDF_POOL_MIN_PAGES,
+    )
     
-    # S'assurer que chaque chunk a le doc_id
-    for chunk in chunks:
-        chunk.metadata.setdefault("doc_id", document_id)
+    # Calcul des embeddings par lots parallèles, sauf s'ils sont déjà en cache
+    texts = [chunk.page_content for chunk in chunks]
+    cache_path = _embedding_cache_path(texts) if EMBEDDING_CACHE_DIR else None
+    vectors = _load_cached_embeddings(cache_path, len(texts)) if cache_path else None
+    if vectors is not None:
+        logger.info(f"♻️ Reusing cached embeddings for {len(chunks)} chunks")
+    else:
+        logger.info(f"🧮 Embedding {len(chunks)} chunks...")
+        vectors = _embed_texts(texts)
+        if cache_path:
+            _save_cached_embeddings(cache_path, vectors)
     
-    # Stockage dans Pinecone
+    # Stockage dans Pinecone (upsert natif par lots): identifiants, vecteurs
+    # et métadonnées sont préparés en listes parallèles, tolist() est fait en C
     logger.info("💾 Storing vectors in Pinecone...")
-    PineconeVectorStore.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        index_name=PINECONE_INDEX_NAME,
+    ids = [f"{document_id}:{i}" for i in range(len(chunks))]
+    metadatas = [
+        {
+            "doc_id": document_id,
+            "page_number": chunk.metadata["page_number"],
+            "text": chunk.page_content,
+        }
+        for chunk in chunks
+    ]
+    _pinecone_index().upsert(
+        vectors=list(zip(ids, vectors.tolist(), metadatas)),
         namespace=PINECONE_NAMESPACE,
+        batch_size=100,
     )
+    if len(chunks):
+        _wait_until_queryable(document_id, vectors[0].tolist(), len(chunks))
     logger.info("✅ PDF successfully processed and stored")
     
     return document_id
 
+_retriever_cache_lock = threading.Lock()
+_retriever_cache_stats = {"hits": 0, "misses": 0}
+# Chaque valeur commence par son heure de stockage (lisible sans décompresser)
+_retriever_cache_header = struct.Struct("<d")
+# Prochaine purge des entrées expirées par ce processus
+_retriever_cache_next_sweep = 0.0
+
+def _is_lock_conflict(error: Exception) -> bool:
+    """
+    Le verrou gdbm n'est pas bloquant: un lecteur fait échouer l'ouverture
+    en écriture d'un autre worker, et inversement. Ce conflit est attendu.
+    """
+    return (
+        getattr(error, "errno", None) in (errno.EAGAIN, errno.EACCES, errno.EWOULDBLOCK)
+        or "can't be" in str(error).lower()
+    )
+
+def _log_cache_error(action: str, error: Exception) -> None:
+    if _is_lock_conflict(error):
+        logger.debug(f"🔒 Retriever cache {action} skipped (file locked): {error}")
+    else:
+        logger.warning(f"⚠️ Retriever cache {action} failed: {error}")
+
+def _retriever_cache_get(key: bytes) -> Optional[List[Document]]:
+    """
+    Lit une entrée du cache en mode lecture seule (verrou partagé entre
+    workers). Une entrée expirée ou illisible est traitée comme absente;
+    les entrées expirées sont purgées lors des écritures.
+    """
+    if gdbm is None or not os.path.exists(RETRIEVER_CACHE_PATH):
+        return None
+    try:
+        with _retriever_cache_lock, gdbm.open(RETRIEVER_CACHE_PATH, "r") as db:
+            raw = db.get(key)
+    except Exception as e:
+        _log_cache_error("read", e)
+        return None
+    
+    if raw is None:
+        return None
+    try:
+        (stored_at,) = _retriever_cache_header.unpack_from(raw)
+        if time.time() - stored_at > RETRIEVER_CACHE_TTL:
+            return None
+        return pickle.loads(lz4.frame.decompress(raw[_retriever_cache_header.size:]))
+    except Exception as e:
+        logger.warning(f"⚠️ Corrupt retriever cache entry ignored: {e}")
+        return None
+
+def _purge_expired(db: Any) -> None:
+    """Supprime les entrées expirées ou illisibles puis compacte le fichier."""
+    now = time.time()
+    expired = []
+    key = db.firstkey()
+    while key is not None:
+        try:
+            (stored_at,) = _retriever_cache_header.unpack_from(db[key])
+            if now - stored_at > RETRIEVER_CACHE_TTL:
+                expired.append(key)
+        except struct.error:
+            expired.append(key)
+        key = db.nextkey(key)
+    
+    # Suppression après le parcours (gdbm ne permet pas de supprimer pendant)
+    for key in expired:
+        del db[key]
+    if expired:
+        db.reorganize()
+        logger.info(f"🧹 Purged {len(expired)} expired retriever cache entries")
+
+def _retriever_cache_set(key: bytes, docs: List[Document]) -> None:
+    global _retriever_cache_next_sweep
+    # Un résultat vide (document pas encore interrogeable) n'est jamais mis en cache
+    if gdbm is None or not docs:
+        return
+    try:
+        value = _retriever_cache_header.pack(time.time()) + lz4.frame.compress(pickle.dumps(docs))
+        with _retriever_cache_lock, gdbm.open(RETRIEVER_CACHE_PATH, "c") as db:
+            db[key] = value
+            # Purge périodique, tant que le verrou d'écriture est détenu
+            if time.time() >= _retriever_cache_next_sweep:
+                _retriever_cache_next_sweep = time.time() + max(60, RETRIEVER_CACHE_TTL // 10)
+                _purge_expired(db)
+    except Exception as e:
+        _log_cache_error("write", e)
+
+class CachedRetriever(BaseRetriever):
+    """
+    Met en cache (dbm + LZ4) les documents renvoyés par un autre retriever,
+    indexés par le SHA256 de (doc_id, question).
+    """
+    retriever: BaseRetriever
+    doc_id: str
+    
+    def _cache_key(self, query: str) -> bytes:
+        return hashlib.sha256(pickle.dumps((self.doc_id, query))).digest()
+    
+    @staticmethod
+    def _record(hit: bool) -> None:
+        _retriever_cache_stats["hits" if hit else "misses"] += 1
+        logger.info(f"🗄️ Retriever cache {'hit' if hit else 'miss'} ({_retriever_cache_stats})")
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._cache_key(query)
+        
+        docs = _retriever_cache_get(key)
+        self._record(hit=docs is not None)
+        if docs is not None:
+            return docs
+        
+        docs = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        _retriever_cache_set(key, docs)
+        return docs
+    
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._cache_key(query)
+        
+        docs = await asyncio.to_thread(_retriever_cache_get, key)
+        self._record(hit=docs is not None)
+        if docs is not None:
+            return docs
+        
+        docs = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        await asyncio.to_thread(_retriever_cache_set, key, docs)
+        return docs
+
+def _search_doc(question: str, doc_id: str, k: int) -> List[Document]:
+    """Requête directe sur l'index Pinecone, filtrée sur un document."""
+    result = _pinecone_index().query(
+        vector=embeddings.embed_query(question),
+        top_k=k,
+        filter={"doc_id": {"$eq": doc_id}},
+        namespace=PINECONE_NAMESPACE,
+        include_metadata=True,
+    )
+    
+    docs = []
+    for match in result.matches:
+        metadata = dict(match.metadata)
+        text = metadata.pop("text", "")
+        docs.append(Document(page_content=text, metadata=metadata))
+    return docs
+
+class PineconeDocRetriever(BaseRetriever):
+    """
+    Retriever limité à un document, qui interroge directement l'index
+    Pinecone partagé (sans passer par PineconeVectorStore).
+    """
+    doc_id: str
+    k: int = 5
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return _search_doc(query, self.doc_id, self.k)
+    
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Exécuté dans un thread pour profiter du cache LRU de embed_query
+        return await asyncio.to_thread(_search_doc, query, self.doc_id, self.k)
+
 def get_retriever_for_doc(doc_id: str):
     """
     Crée un 'retriever' qui ne cherche QUE dans le document spécifié.
@@ -153,18 +593,7 @@ def get_retriever_for_doc(doc_id: str):
     if not PINE_CONE_AVAILABLE:
         raise RuntimeError("Pinecone is not available. Please check your API key.")
     
-    vectorstore = PineconeVectorStore.from_existing_index(
-        index_name=PINECONE_INDEX_NAME,
-        embedding=embeddings,
-        namespace=PINECONE_NAMESPACE,
-    )
-    
-    return vectorstore.as_retriever(
-        search_kwargs={
-            "k": 5,
-            "filter": {"doc_id": {"$eq": doc_id}},
-        }
-    )
+    return CachedRetriever(retriever=PineconeDocRetriever(doc_id=doc_id), doc_id=doc_id)
 
 def _format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
@@ -175,30 +604,51 @@ DEFAULT_SYSTEM_PROMPT = (
     "Keep your answers concise and accurate."
 )
 
-def build_qa_chain(doc_id: str) -> RunnableParallel:
+# Instruction statique en tête, puis contexte et question dynamiques. Le
+# contenu du PDF n'est pas fiable: il est transmis dans un message utilisateur,
+# jamais avec l'autorité d'un message système. (Le cache de prompt d'Azure
+# OpenAI exige un préfixe commun d'au moins 1024 tokens: il ne se déclenche
+# pas avec cette instruction de quelques dizaines de tokens.)
+_SYSTEM_MESSAGE = SystemMessage(content=DEFAULT_SYSTEM_PROMPT)
+
+def _build_messages(inputs: Dict[str, Any]) -> List[BaseMessage]:
+    """
+    Construit directement les messages du prompt à partir de
+    {"docs", "question"}, sans passer par le formatage d'un ChatPromptTemplate.
+    """
+    return [
+        _SYSTEM_MESSAGE,
+        HumanMessage(content=f"Context:\n{_format_docs(inputs['docs'])}"),
+        HumanMessage(content=f"Question: {inputs['question']}"),
+    ]
+
+# Génération de la réponse à partir de {"docs", "question"}
+answer_chain = RunnableLambda(_build_messages) | llm | StrOutputParser()
+
+def build_qa_chain(doc_id: str) -> Runnable:
     """
     Construit la chaîne RAG pour un document spécifique.
+    La recherche n'est faite qu'une fois: ses documents servent à la fois
+    de contexte pour le LLM et de sources renvoyées au client.
     """
     retriever = get_retriever_for_doc(doc_id)
     
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", DEFAULT_SYSTEM_PROMPT),
-            ("human", "Context:\n{context}\n\nQuestion: {question}"),
-        ]
+    return (
+        RunnableParallel(question=RunnablePassthrough(), docs=retriever)
+        | RunnablePassthrough.assign(answer=answer_chain)
+        | RunnableLambda(
+            lambda x: {"answer": x["answer"], "source_documents": x["docs"]}
+        )
     )
+
+async def astream_qa(doc_id: str, question: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Variante en streaming de build_qa_chain: produit {"token": ...} au fil de
+    la génération, puis {"source_documents": [...]} une fois la réponse finie.
+    """
+    docs = await get_retriever_for_doc(doc_id).ainvoke(question)
     
-    answer_chain = (
-        {
-            "context": retriever | RunnableLambda(_format_docs),
-            "question": RunnablePassthrough(),
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
+    async for token in answer_chain.astream({"docs": docs, "question": question}):
+        yield {"token": token}
     
-    return RunnableParallel(
-        answer=answer_chain,
-        source_documents=retriever,
-    )
\ No newline at end of file
+    yield {"source_documents": docs}
\ No newline at end of file
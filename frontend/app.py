@@ -1,7 +1,7 @@
 """
 Frontend Flask application for RAG Chatbot
 """
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 import requests
 import os
 from datetime import datetime
@@ -41,13 +41,15 @@ def upload_pdf():
         
         if response.status_code == 200:
             data = response.json()
-            # Stocker le doc_id dans la session
-            session['doc_id'] = data['doc_id']
-            session['filename'] = file.filename
+            # Document en attente: la session n'y bascule qu'une fois
+            # l'ingestion terminée (voir /upload-status)
+            session['pending_doc_id'] = data['doc_id']
+            session['pending_filename'] = file.filename
             return jsonify({
                 'success': True,
                 'doc_id': data['doc_id'],
                 'filename': file.filename,
+                'status': data['status'],
                 'message': data['message']
             })
         else:
@@ -58,6 +60,30 @@ def upload_pdf():
     except Exception as e:
         return jsonify({'error': f'Erreur: {str(e)}'}), 500
 
+@app.route('/upload-status/<doc_id>')
+def upload_status(doc_id):
+    """Suivre l'ingestion d'un PDF côté backend"""
+    try:
+        response = requests.get(
+            f"{BACKEND_API_URL}/upload-status/{doc_id}",
+            timeout=10
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            # Stocker le doc_id dans la session une fois le document ingéré
+            if data['status'] == 'completed' and session.get('pending_doc_id') == doc_id:
+                session['doc_id'] = session.pop('pending_doc_id')
+                session['filename'] = session.pop('pending_filename', None)
+            return jsonify(data)
+        else:
+            return jsonify({'error': response.json().get('detail', 'Statut indisponible')}), response.status_code
+            
+    except requests.exceptions.ConnectionError:
+        return jsonify({'error': 'Impossible de se connecter au serveur backend'}), 500
+    except Exception as e:
+        return jsonify({'error': f'Erreur: {str(e)}'}), 500
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Envoyer une question au chatbot"""
@@ -101,6 +127,47 @@ def chat():
     except Exception as e:
         return jsonify({'error': f'Erreur: {str(e)}'}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Relayer la réponse du chatbot en streaming (Server-Sent Events)"""
+    if 'doc_id' not in session:
+        return jsonify({'error': 'Veuillez d\'abord uploader un PDF'}), 400
+    
+    data = request.json
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'error': 'La question ne peut pas être vide'}), 400
+    
+    payload = {
+        "doc_id": session['doc_id'],
+        "question": question,
+        "history": data.get('history', [])
+    }
+    
+    try:
+        response = requests.post(
+            f"{BACKEND_API_URL}/chat/stream",
+            json=payload,
+            stream=True,
+            timeout=30  # Timeout de 30 secondes entre deux événements
+        )
+    except requests.exceptions.Timeout:
+        return jsonify({'error': 'La requête a pris trop de temps. Veuillez réessayer.'}), 408
+    except requests.exceptions.ConnectionError:
+        return jsonify({'error': 'Impossible de se connecter au serveur backend'}), 500
+    
+    if response.status_code != 200:
+        return jsonify({'error': response.json().get('detail', 'Erreur lors de la génération')}), 500
+    
+    def relay():
+        # chunk_size=None: chaque événement est relayé dès sa réception
+        with response:
+            for line in response.iter_lines(chunk_size=None):
+                yield line + b"\n"
+    
+    return Response(stream_with_context(relay()), mimetype='text/event-stream')
+
 @app.route('/reset', methods=['POST'])
 def reset_session():
     """Réinitialiser la session (nouveau document)"""
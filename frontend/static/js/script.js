@@ -118,6 +118,10 @@ async function handleFileUpload() {
         const data = await response.json();
         
         if (response.ok) {
+            // Attendre la fin de l'ingestion côté backend
+            showLoading('Indexation du document...');
+            const status = await waitForIngestion(data.doc_id);
+            
             // Mettre à jour l'interface
             currentDocId = data.doc_id;
             
@@ -133,7 +137,7 @@ async function handleFileUpload() {
             chatHistory = [];
             clearChat();
             
-            showAlert('success', data.message);
+            showAlert('success', status.detail);
             
             // Afficher un message de bienvenue
             addMessage('system', `Document "${data.filename}" chargé avec succès. Posez-moi des questions !`);
@@ -141,13 +145,36 @@ async function handleFileUpload() {
             showAlert('error', data.error || 'Erreur lors de l\'upload');
         }
     } catch (error) {
-        showAlert('error', 'Erreur de connexion au serveur');
+        // Erreur réseau (TypeError) ou échec de l'ingestion signalé par le backend
+        showAlert('error', error instanceof TypeError ? 'Erreur de connexion au serveur' : error.message);
     } finally {
         hideLoading();
         fileInput.value = ''; // Réinitialiser l'input
     }
 }
 
+// Interroger le backend jusqu'à la fin de l'ingestion du PDF
+async function waitForIngestion(docId) {
+    const deadline = Date.now() + 10 * 60 * 1000; // 10 minutes max
+    
+    while (Date.now() < deadline) {
+        const response = await fetch(`/upload-status/${docId}`);
+        const data = await response.json();
+        
+        if (!response.ok || data.status === 'failed') {
+            throw new Error(data.error || data.detail || 'Erreur lors du traitement du PDF');
+        }
+        
+        if (data.status === 'completed') {
+            return data;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+    
+    throw new Error('Le traitement du PDF prend trop de temps. Veuillez réessayer.');
+}
+
 // Envoyer une question
 async function sendQuestion() {
     const input = document.getElementById('question-input');
@@ -170,7 +197,7 @@ async function sendQuestion() {
     showLoading('Recherche dans le document...');
     
     try {
-        const response = await fetch('/chat', {
+        const response = await fetch('/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -181,23 +208,19 @@ async function sendQuestion() {
             })
         });
         
-        const data = await response.json();
-        
-        if (response.ok) {
-            // Ajouter la réponse au chat
-            addMessage('bot', data.answer);
-            
-            // Ajouter à l'historique
-            chatHistory.push({ role: 'assistant', content: data.answer });
-            
-            // Afficher les sources
-            if (data.sources && data.sources.length > 0) {
-                displaySources(data.sources);
-                document.getElementById('sources-section').style.display = 'block';
-            }
-        } else {
+        if (!response.ok) {
+            const data = await response.json();
             addMessage('bot', `Désolé, une erreur est survenue: ${data.error}`);
+            return;
         }
+        
+        // La réponse s'affiche au fil des tokens reçus
+        hideLoading();
+        const content = addMessage('bot', '').querySelector('.message-content');
+        const answer = await readAnswerStream(response, content);
+        
+        // Ajouter à l'historique
+        chatHistory.push({ role: 'assistant', content: answer });
     } catch (error) {
         addMessage('bot', 'Désolé, je ne peux pas répondre pour le moment. Veuillez vérifier votre connexion.');
     } finally {
@@ -206,6 +229,43 @@ async function sendQuestion() {
     }
 }
 
+// Lire le flux Server-Sent Events de la réponse et l'afficher progressivement
+async function readAnswerStream(response, content) {
+    const chatMessages = document.getElementById('chat-messages');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop(); // Événement incomplet conservé pour la suite
+        
+        for (const event of events) {
+            if (!event.startsWith('data: ')) continue;
+            const data = JSON.parse(event.slice(6));
+            
+            if (data.token) {
+                answer += data.token;
+                content.textContent = answer;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (data.sources && data.sources.length > 0) {
+                // Afficher les sources
+                displaySources(data.sources);
+                document.getElementById('sources-section').style.display = 'block';
+            } else if (data.error) {
+                content.textContent = `Désolé, une erreur est survenue: ${data.error}`;
+            }
+        }
+    }
+    
+    return answer;
+}
+
 // Ajouter un message au chat
 function addMessage(sender, content) {
     const chatMessages = document.getElementById('chat-messages');
@@ -235,6 +295,8 @@ function addMessage(sender, content) {
     
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    
+    return messageDiv;
 }
 
 // Afficher les sources